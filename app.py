@@ -1,56 +1,172 @@
+import hashlib
+import io
+import operator
+from typing import Callable, NamedTuple
+
 import streamlit as st
 import pandas as pd
+import numpy as np
 
 # --- Page Configuration ---
 st.set_page_config(page_title="Investor Checklist", layout="centered")
 
-# --- Helper Functions for Analysis ---
+REQUIRED_COLUMNS = ['Ticker', 'ROE', 'Debt to Equity', 'PE Ratio', '5Y Profit Growth', 'PEG Ratio', 'Promoter Holding Pledged']
+NUMERIC_COLUMNS = ['ROE', 'Debt to Equity', 'PE Ratio', '5Y Profit Growth', 'PEG Ratio', 'Promoter Holding Pledged']
 
-def check_buffett(stock):
-    """Analyzes a stock based on Warren Buffett's core principles."""
-    results = []
-    # 1. Consistent Profitability (ROE > 15%)
-    if stock['ROE'] > 15:
-        results.append("✅ **Consistent Profitability:** ROE is above 15%, indicating an efficient business.")
-    else:
-        results.append(f"❌ **Inconsistent Profitability:** ROE is {stock['ROE']:.2f}%, below the 15% threshold.")
+# --- Checklist Rules ---
 
-    # 2. Low Debt (Debt to Equity < 0.5)
-    if stock['Debt to Equity'] < 0.5:
-        results.append("✅ **Low Debt:** Debt to Equity is low, suggesting a strong balance sheet.")
-    else:
-        results.append(f"❌ **High Debt:** Debt to Equity is {stock['Debt to Equity']:.2f}, which is higher than ideal.")
+class Rule(NamedTuple):
+    """One checklist rule; a stock passes when `compare(value, threshold)` holds."""
+    label: str           # summary table column header
+    column: str          # CSV column the rule reads
+    compare: Callable    # e.g. operator.gt
+    threshold: float
+    weight: int
+    pass_msg: str
+    fail_msg: str        # template filled with the stock's value
 
+BUFFETT_RULES = (
+    # 1. Consistent Profitability (ROE > 15%)
+    Rule('Profitability', 'ROE', operator.gt, 15, 1,
+         "✅ **Consistent Profitability:** ROE is above 15%, indicating an efficient business.",
+         "❌ **Inconsistent Profitability:** ROE is {:.2f}%, below the 15% threshold."),
+    # 2. Low Debt (Debt to Equity < 0.5)
+    Rule('Low Debt', 'Debt to Equity', operator.lt, 0.5, 1,
+         "✅ **Low Debt:** Debt to Equity is low, suggesting a strong balance sheet.",
+         "❌ **High Debt:** Debt to Equity is {:.2f}, which is higher than ideal."),
     # 3. Fair Valuation (P/E Ratio < 25)
-    if stock['PE Ratio'] < 25:
-        results.append("✅ **Fair Valuation:** P/E Ratio is reasonable, not excessively expensive.")
-    else:
-        results.append(f"❌ **Potentially Overvalued:** P/E Ratio is {stock['PE Ratio']:.2f}, suggesting high market expectations.")
-        
-    return results
+    Rule('Valuation', 'PE Ratio', operator.lt, 25, 1,
+         "✅ **Fair Valuation:** P/E Ratio is reasonable, not excessively expensive.",
+         "❌ **Potentially Overvalued:** P/E Ratio is {:.2f}, suggesting high market expectations."),
+)
 
-def check_lynch(stock):
-    """Analyzes a stock based on Peter Lynch's growth and value principles."""
-    results = []
+LYNCH_RULES = (
     # 1. Strong Earnings Growth (Profit Growth > 20%)
-    if stock['5Y Profit Growth'] > 20:
-        results.append("✅ **Strong Earnings Growth:** 5-year profit growth is impressive.")
-    else:
-        results.append(f"❌ **Slow Earnings Growth:** 5-year profit growth is {stock['5Y Profit Growth']:.2f}%, below the 20% target.")
-
+    Rule('Earnings Growth', '5Y Profit Growth', operator.gt, 20, 1,
+         "✅ **Strong Earnings Growth:** 5-year profit growth is impressive.",
+         "❌ **Slow Earnings Growth:** 5-year profit growth is {:.2f}%, below the 20% target."),
     # 2. Reasonable Valuation (PEG Ratio < 1.2)
-    if stock['PEG Ratio'] < 1.2:
-        results.append("✅ **Growth at a Reasonable Price (GARP):** PEG ratio is attractive.")
-    else:
-        results.append(f"❌ **Expensive Growth:** PEG ratio is {stock['PEG Ratio']:.2f}, suggesting the price may have run ahead of growth.")
-
+    Rule('GARP', 'PEG Ratio', operator.lt, 1.2, 1,
+         "✅ **Growth at a Reasonable Price (GARP):** PEG ratio is attractive.",
+         "❌ **Expensive Growth:** PEG ratio is {:.2f}, suggesting the price may have run ahead of growth."),
     # 3. Low Promoter Pledging (Pledged % < 5%)
-    if stock['Promoter Holding Pledged'] < 5:
-        results.append("✅ **Low Promoter Pledging:** Indicates confidence from the management.")
-    else:
-        results.append(f"❌ **High Promoter Pledging:** Pledged holding is {stock['Promoter Holding Pledged']:.2f}%, a potential red flag.")
-        
-    return results
+    Rule('Low Pledging', 'Promoter Holding Pledged', operator.lt, 5, 1,
+         "✅ **Low Promoter Pledging:** Indicates confidence from the management.",
+         "❌ **High Promoter Pledging:** Pledged holding is {:.2f}%, a potential red flag."),
+)
+
+# --- Helper Functions for Analysis ---
+
+def max_score(rules):
+    """Returns the best score a stock can get on a rule set."""
+    return sum(rule.weight for rule in rules)
+
+def score_df(df, rules):
+    """Evaluates every rule against every stock; returns the pass flags (one row per stock) and weighted scores."""
+    passes = np.column_stack([rule.compare(df[rule.column].to_numpy(), rule.threshold) for rule in rules])
+    weights = np.array([rule.weight for rule in rules])
+    return passes, passes @ weights
+
+def explain(df, rules, passes):
+    """Builds checklist messages for a rule set (one row per stock, one column per rule).
+
+    Passing stocks share the rule's constant message; only the failing values
+    are formatted, one Series.map per rule rather than an f-string per cell.
+    """
+    messages = np.empty(passes.shape, dtype=object)
+    for j, rule in enumerate(rules):
+        ok = passes[:, j]
+        failed = ~ok
+        messages[ok, j] = rule.pass_msg
+        messages[failed, j] = df[rule.column][failed].map(rule.fail_msg.format).to_numpy()
+    return messages
+
+def summarize(df, buffett_flags, buffett_scores, lynch_flags, lynch_scores):
+    """Builds the one-row-per-stock summary table with scores and a ✅/❌ glyph per rule."""
+    summary = pd.DataFrame({
+        'Ticker': df['Ticker'].to_numpy(),
+        'Buffett Score': buffett_scores,
+        'Lynch Score': lynch_scores,
+    })
+    for rule, flags in zip(BUFFETT_RULES, buffett_flags.T):
+        summary[rule.label] = np.where(flags, "✅", "❌")
+    for rule, flags in zip(LYNCH_RULES, lynch_flags.T):
+        summary[rule.label] = np.where(flags, "✅", "❌")
+    return summary
+
+def score_upload(file_bytes):
+    """Parses, cleans and scores an uploaded CSV; returns None when no usable rows remain."""
+    # Single C-engine pass that only materializes the columns we use;
+    # '-' is treated as missing on top of pandas' default NA markers
+    df = pd.read_csv(
+        io.BytesIO(file_bytes),
+        usecols=REQUIRED_COLUMNS,
+        dtype={'Ticker': 'string'},
+        na_values=['-'],
+        engine='c',
+    )
+
+    # =================================================================
+    # THE FIX: Data Cleaning & Conversion Section
+    # =================================================================
+    # One vectorized strip instead of cleaning each ticker as it is rendered
+    df['Ticker'] = df['Ticker'].str.strip()
+
+    for col in NUMERIC_COLUMNS:
+        # pd.to_numeric will convert columns to numbers. 
+        # The 'coerce' argument turns any problematic values (like text) into NaN (Not a Number)
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Drop any rows that have missing values after conversion; one vectorized
+    # mask over the required columns, renumbered so positions match labels
+    df = df.dropna(subset=REQUIRED_COLUMNS).reset_index(drop=True)
+    # =================================================================
+    # End of Fix
+    # =================================================================
+
+    if df.empty:
+        return None
+
+    # Score every stock in one vectorized pass
+    buffett_flags, buffett_scores = score_df(df, BUFFETT_RULES)
+    lynch_flags, lynch_scores = score_df(df, LYNCH_RULES)
+    return df, buffett_flags, buffett_scores, lynch_flags, lynch_scores
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=32)
+def load_and_score(file_key, _file_bytes):
+    """Cached score_upload() plus its summary table; (None, None) when no rows survive cleaning.
+
+    Keyed on the upload's digest; the leading underscore keeps Streamlit from
+    hashing the raw bytes again on every call.
+    """
+    scored = score_upload(_file_bytes)
+    if scored is None:
+        return None, None
+    return summarize(*scored), scored
+
+def render_checklists(df, buffett_flags, buffett_scores, lynch_flags, lynch_scores, selected):
+    """Renders a collapsed Buffett/Lynch narrative for each selected ticker."""
+    rows = np.flatnonzero(df['Ticker'].isin(selected))
+    picked = df.iloc[rows]
+    # Messages are formatted here, for the selected rows only, so the cache holds just flags and scores
+    buffett_messages = explain(picked, BUFFETT_RULES, buffett_flags[rows])
+    lynch_messages = explain(picked, LYNCH_RULES, lynch_flags[rows])
+    buffett_max, lynch_max = max_score(BUFFETT_RULES), max_score(LYNCH_RULES)
+    for i, (row, ticker) in enumerate(zip(rows, picked['Ticker'])):
+        label = (f"{ticker} — Buffett {buffett_scores[row]}/{buffett_max}, "
+                 f"Lynch {lynch_scores[row]}/{lynch_max}")
+        with st.expander(label):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.subheader("Buffett Checklist")
+                for result in buffett_messages[i]:
+                    st.markdown(result)
+                    
+            with col2:
+                st.subheader("Lynch Checklist")
+                for result in lynch_messages[i]:
+                    st.markdown(result)
 
 # --- Main App UI ---
 st.title("Investor Checklist: Buffett vs. Lynch")
@@ -60,55 +176,45 @@ uploaded_file = st.file_uploader("📂 Upload your Stock CSV file", type="csv")
 
 if uploaded_file is not None:
     try:
-        df = pd.read_csv(uploaded_file)
+        file_bytes = uploaded_file.getvalue()
         
         # --- Data Validation ---
-        required_columns = ['Ticker', 'ROE', 'Debt to Equity', 'PE Ratio', '5Y Profit Growth', 'PEG Ratio', 'Promoter Holding Pledged']
-        if not all(col in df.columns for col in required_columns):
-            st.error(f"CSV file is missing required columns. Please ensure it contains: {', '.join(required_columns)}")
+        # Only the header is parsed here, so a bad file fails before any scoring
+        columns = pd.read_csv(io.BytesIO(file_bytes), nrows=0).columns
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            st.error(f"CSV file is missing required columns: {', '.join(missing)}. Please ensure it contains: {', '.join(REQUIRED_COLUMNS)}")
         else:
-            # =================================================================
-            # THE FIX: Data Cleaning & Conversion Section
-            # =================================================================
             st.info("Cleaning and converting data types...")
-            numeric_cols = ['ROE', 'Debt to Equity', 'PE Ratio', '5Y Profit Growth', 'PEG Ratio', 'Promoter Holding Pledged']
-            
-            for col in numeric_cols:
-                # pd.to_numeric will convert columns to numbers. 
-                # The 'coerce' argument turns any problematic values (like text) into NaN (Not a Number)
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Drop any rows that have missing values after conversion
-            df.dropna(inplace=True)
-            # =================================================================
-            # End of Fix
-            # =================================================================
 
-            if df.empty:
+            # Streamlit reruns the whole script on every interaction; re-score
+            # only when the uploaded bytes actually change
+            file_key = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+            if st.session_state.get('last_hash') != file_key:
+                st.session_state['result'] = load_and_score(file_key, file_bytes)
+                st.session_state['last_hash'] = file_key
+            summary, scored = st.session_state['result']
+
+            if summary is None:
                 st.error("Analysis could not be performed. All rows in the CSV file contained invalid or missing data after cleaning. Please check your CSV file.")
             else:
-                for index, row in df.iterrows():
-                    st.markdown("---")
-                    st.header(f"Analysis for: {row['Ticker']}")
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        st.subheader("Buffett Checklist")
-                        buffett_results = check_buffett(row)
-                        for result in buffett_results:
-                            st.markdown(result)
-                            
-                    with col2:
-                        st.subheader("Lynch Checklist")
-                        lynch_results = check_lynch(row)
-                        for result in lynch_results:
-                            st.markdown(result)
+                # One summary table followed by a collapsed narrative per selected ticker,
+                # instead of a header + six markdown blocks each
+                st.dataframe(summary, hide_index=True, column_config={
+                    'Buffett Score': st.column_config.ProgressColumn(
+                        min_value=0, max_value=max_score(BUFFETT_RULES), format="%d"),
+                    'Lynch Score': st.column_config.ProgressColumn(
+                        min_value=0, max_value=max_score(LYNCH_RULES), format="%d"),
+                })
+
+                # Only the tickers picked here get a detailed checklist
+                tickers = list(dict.fromkeys(summary['Ticker']))
+                selected = st.multiselect("Tickers to deep-dive", tickers, default=tickers[:5])
+                render_checklists(*scored, selected)
 
     except Exception as e:
         st.error(f"An error occurred while processing the file: {e}")
         st.exception(e) # This will show the full error traceback for debugging
 
 else:
-    st.info("Awaiting your CSV file to begin analysis...")
-
+    st.info("Awaiting your CSV file to begin analysis...")
\ No newline at end of file